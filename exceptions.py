@@ -6,6 +6,13 @@ class UnreachablePracticumEndpoint(Exception):
     pass
 
 
+class PracticumRetryAfter(UnreachablePracticumEndpoint):
+    def __init__(self, retry_after: int):
+        """Сохранение задержки из заголовка Retry-After."""
+        super().__init__(f"Практикум просит повторить через {retry_after} с.")
+        self.retry_after = retry_after
+
+
 class MessageSendingFailed(Exception):
     pass
 
@@ -1,12 +1,19 @@
 import logging
 import os
+import random
+import signal
 import sys
 import time
+from email.utils import formatdate
 from pathlib import Path
 
+import orjson
 import requests
 import telegram
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from telegram.utils.request import Request
+from urllib3.util.retry import Retry
 
 import exceptions
 
@@ -18,45 +25,126 @@ TELEGRAM_CHAT_ID: str = os.getenv("TELEGRAM_CHAT_ID")
 
 ENDPOINT: str = "https://practicum.yandex.ru/api/user_api/homework_statuses/"
 HEADERS: dict[str, str] = {"Authorization": f"OAuth {PRACTICUM_TOKEN}"}
+REQUEST_TIMEOUT: tuple[int, int] = (5, 30)
+SEND_MAX_RETRIES: int = 2
+SEND_MAX_WAIT: int = 30
+# Период запуска из cron (секунды) и потолок задержки после сбоев.
+RETRY_PERIOD: int = int(os.getenv("RETRY_PERIOD", "600"))
+MAX_BACKOFF: int = 3600
+BACKOFF_RATE: float = 1.5
+PRACTICUM_ERRORS: tuple[type[Exception], ...] = (
+    exceptions.PracticumRequestError,
+    exceptions.UnreachablePracticumEndpoint,
+)
+
+LSC_PATH: Path = (Path(__file__).parent / ".last_success").resolve()
+BACKOFF_PATH: Path = (Path(__file__).parent / ".backoff").resolve()
+
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        ),
+    ),
+)
 
 HOMEWORK_VERDICTS: dict[str, str] = {
     "approved": "Работа проверена: ревьюеру всё понравилось.",
     "reviewing": "Работа взята на проверку ревьюером.",
     "rejected": "Работа проверена: у ревьюера есть замечания.",
 }
+_TEMPLATES: dict[str, str] = {
+    status: 'Изменился статус проверки работы "{name}". ' + verdict
+    for status, verdict in HOMEWORK_VERDICTS.items()
+}
+
+_shutdown_requested: bool = False
+
+
+def _handle_shutdown(signum, frame) -> None:
+    """Прерывание ожидания по сигналу завершения."""
+    global _shutdown_requested
+    _shutdown_requested = True
+
+
+def _wait(seconds: float) -> None:
+    """Ожидание короткими отрезками с проверкой сигнала завершения."""
+    deadline: float = time.monotonic() + seconds
+    while not _shutdown_requested:
+        remaining: float = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(1, remaining))
 
 
 def check_tokens() -> bool:
     """Проверка наличия обязательных переменных окружения."""
-    env_list: tuple[str] = (
-        "PRACTICUM_TOKEN",
-        "TELEGRAM_TOKEN",
-        "TELEGRAM_CHAT_ID"
+    env_list: tuple[tuple[str, str], ...] = (
+        ("PRACTICUM_TOKEN", PRACTICUM_TOKEN),
+        ("TELEGRAM_TOKEN", TELEGRAM_TOKEN),
+        ("TELEGRAM_CHAT_ID", TELEGRAM_CHAT_ID),
     )
-    return all(map(lambda x: os.getenv(x), env_list))
+    missing: list[str] = [name for name, value in env_list if not value]
+    if missing:
+        logging.critical(
+            f"Не объявлены переменные окружения: {', '.join(missing)}. "
+            "Программа принудительно остановлена."
+        )
+    return not missing
 
 
 def send_message(bot, message: str) -> None:
     """Отправка сообщения ботом телеграмма."""
-    logging.debug(f"Отправляем сообщение в телеграм: {message}.")
-    try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-    except telegram.error.TelegramError:
-        logging.error(f"Бот не смог отправить сообщение {message}")
-    else:
-        logging.debug(f"Бот отправил сообщение: {message}")
+    logging.debug("Отправляем сообщение в телеграм: %s.", message)
+    for attempt in range(SEND_MAX_RETRIES + 1):
+        if _shutdown_requested:
+            raise exceptions.MessageSendingFailed(
+                f"Отправка прервана сигналом завершения: {message}"
+            )
+        try:
+            bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+        except telegram.error.RetryAfter as error:
+            if attempt == SEND_MAX_RETRIES:
+                break
+            if error.retry_after > SEND_MAX_WAIT:
+                raise exceptions.MessageSendingFailed(
+                    f"Телеграм просит подождать {error.retry_after} с., "
+                    f"откладываем до следующего запуска: {message}"
+                )
+            logging.debug(
+                "Телеграм просит повторить через %s с.", error.retry_after
+            )
+            _wait(error.retry_after)
+        except telegram.error.TelegramError:
+            break
+        else:
+            logging.debug("Бот отправил сообщение: %s", message)
+            return
+    logging.error(f"Бот не смог отправить сообщение {message}")
 
 
 def get_api_answer(timestamp: int) -> dict:
     """Получить ответ от практикума."""
-    requests_params = {
-        "headers": {"Authorization": f"OAuth {PRACTICUM_TOKEN}"},
-        "params": {"from_date": str(timestamp)},
-    }
-
-    logging.debug(f"Запрашиваем домашки за {timestamp}.")
+    logging.debug("Запрашиваем домашки за %s.", timestamp)
+    headers: dict[str, str] = {}
+    if timestamp:
+        headers["If-Modified-Since"] = formatdate(timestamp, usegmt=True)
     try:
-        homework_statuses = requests.get(ENDPOINT, **requests_params)
+        homework_statuses = SESSION.get(
+            ENDPOINT,
+            headers=headers,
+            params={"from_date": str(timestamp)},
+            timeout=REQUEST_TIMEOUT,
+        )
     except requests.RequestException:
         raise exceptions.PracticumRequestError(
             "Ошибка при запросе к практикуму."
@@ -66,6 +154,10 @@ def get_api_answer(timestamp: int) -> dict:
             "Ошибка при запросе к практикуму"
         )
 
+    if homework_statuses.status_code == 304:
+        logging.debug("Домашки не изменились с прошлого обращения.")
+        return {"homeworks": []}
+
     if homework_statuses.status_code != 200:
         log_message: str = (
             f"Эндпоинт практикума не доступен, "
@@ -74,26 +166,31 @@ def get_api_answer(timestamp: int) -> dict:
             f"тело ответа: {homework_statuses.text}"
         )
         logging.error(log_message)
+        retry_after: str = homework_statuses.headers.get("Retry-After", "")
+        status_code: int = homework_statuses.status_code
+        if status_code in (429, 503) and retry_after.isdigit():
+            raise exceptions.PracticumRetryAfter(int(retry_after))
         raise exceptions.UnreachablePracticumEndpoint
     else:
         log_message: str = "Ответ от практикума получен."
         logging.debug(log_message)
 
-    return homework_statuses.json()
+    return orjson.loads(homework_statuses.content)
 
 
 def check_response(response) -> None:
     """Проверка наличия домашних работ в ответе от практикума."""
     if not isinstance(response, dict):
         raise TypeError
-    if not isinstance(response.get("homeworks"), list):
+    code: str = response.get("code")
+    if code == "not_authenticated":
+        raise exceptions.PracticumRequestError("Ошибра авторизации.")
+    if code == "UnknownError":
+        raise exceptions.PracticumRequestError("Неизвестная ошибка.")
+    homeworks: list = response.get("homeworks")
+    if not isinstance(homeworks, list):
         raise TypeError
-    if "code" in response:
-        if response.get("code") == "not_authenticated":
-            raise exceptions.PracticumRequestError("Ошибра авторизации.")
-        if response.get("code") == "UnknownError":
-            raise exceptions.PracticumRequestError("Неизвестная ошибка.")
-    if not len(response.get("homeworks")):
+    if not homeworks:
         logging.debug("Список домашних работ пуст.")
 
 
@@ -104,51 +201,130 @@ def parse_status(homework) -> str:
     if "homework_name" not in homework:
         raise exceptions.MalformedPracticumReply
 
-    homework_name: str = homework.get("homework_name")
-    homework_status: str = homework.get("status")
-    if homework_status not in HOMEWORK_VERDICTS:
+    homework_status: str = homework["status"]
+    if homework_status not in _TEMPLATES:
         raise ValueError
-    verdict: str = HOMEWORK_VERDICTS.get(homework_status)
 
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    return _TEMPLATES[homework_status].format(name=homework["homework_name"])
+
+
+def _read_ts() -> int:
+    """Чтение времени последнего успешного обращения к практикуму."""
+    try:
+        with open(str(LSC_PATH), "r") as success_stamp:
+            return int(success_stamp.read())
+    except FileNotFoundError:
+        # Первый запуск: забираем всю историю домашек.
+        logging.debug("Файл с последним обращением не существует")
+        return 0
+    except ValueError:
+        # Повреждённая отметка: не отправляем всю историю заново,
+        # а смотрим только последний период запуска.
+        logging.error("Файл с последним обращением повреждён")
+        return int(time.time()) - RETRY_PERIOD
+
+
+def _write_ts(timestamp: int) -> None:
+    """Атомарная запись времени последнего успешного обращения."""
+    tmp_path: Path = LSC_PATH.with_suffix(".tmp")
+    with open(str(tmp_path), "w") as success_stamp:
+        success_stamp.write(str(timestamp))
+    os.replace(tmp_path, LSC_PATH)
+
+
+def _read_backoff() -> tuple[int, int]:
+    """Чтение числа сбоев подряд и времени следующей попытки."""
+    try:
+        with open(str(BACKOFF_PATH), "r") as backoff:
+            fail_idx, next_attempt = backoff.read().split()
+            return int(fail_idx), int(next_attempt)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        logging.error("Файл с задержкой повторных запросов повреждён")
+    return 0, 0
+
+
+def _write_backoff(
+    fail_idx: int, poll_started: int, retry_after: int = 0
+) -> None:
+    """Запись времени следующей попытки с экспоненциальной задержкой."""
+    delay: float = random.uniform(
+        RETRY_PERIOD, min(MAX_BACKOFF, RETRY_PERIOD * BACKOFF_RATE ** fail_idx)
+    )
+    next_attempt: int = int(poll_started + max(delay, retry_after))
+    tmp_path: Path = BACKOFF_PATH.with_suffix(".tmp")
+    with open(str(tmp_path), "w") as backoff:
+        backoff.write(f"{fail_idx} {next_attempt}")
+    os.replace(tmp_path, BACKOFF_PATH)
 
 
 def main():
     """Основная логика работы бота."""
     if not check_tokens():
-        logging.critical(
-            "Не объявлены необходимые переменные окружения. "
-            "Программа принудительно остановлена."
-        )
         os._exit(0)
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    signal.signal(signal.SIGTERM, _handle_shutdown)
 
-    lsc_path: Path = (Path(__file__).parent / ".last_success").resolve()
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(connect_timeout=10, read_timeout=15),
+    )
 
-    try:
-        with open(str(lsc_path), "r") as success_stamp:
-            last_successful_check: int = int(success_stamp.read())
-    except FileNotFoundError:
-        log_message = "Файл с последним обращением не существует"
-        logging.debug(log_message)
-        last_successful_check: int = 0
+    fail_idx, next_attempt = _read_backoff()
+    # Запуски из cron не совпадают с next_attempt до секунды, поэтому
+    # попытка засчитывается, если до неё осталось меньше полупериода.
+    if time.time() + RETRY_PERIOD / 2 < next_attempt:
+        logging.debug(
+            "Практикум недавно был недоступен, следующая попытка после %s.",
+            next_attempt,
+        )
+        return
+
+    last_successful_check: int = _read_ts()
+    poll_started: int = int(time.time())
 
     try:
         practicum_response: dict = get_api_answer(last_successful_check)
+        if _shutdown_requested:
+            logging.debug("Работа прервана до отправки сообщений.")
+            return
         check_response(practicum_response)
         homeworks: list = practicum_response.get("homeworks")
+        unsent: bool = False
         for homework in homeworks:
-            log_message: str = parse_status(homework)
-            send_message(bot, log_message)
+            try:
+                send_message(bot, parse_status(homework))
+            except exceptions.MessageSendingFailed as error:
+                logging.error(str(error))
+                unsent = True
+                break
+            except Exception as error:
+                log_message = f"Сбой при обработке домашки: {str(error)}"
+                logging.error(log_message)
     except Exception as error:
         log_message = f"Сбой в работе программы: {str(error)}"
         logging.error(log_message)
+        if isinstance(error, PRACTICUM_ERRORS):
+            try:
+                _write_backoff(
+                    fail_idx + 1,
+                    poll_started,
+                    getattr(error, "retry_after", 0),
+                )
+            except Exception as error:
+                log_message = f"Сбой в работе программы: {str(error)}"
+                logging.error(log_message)
     else:
+        if unsent:
+            # Отметка одна на всю пачку, поэтому при следующем запуске
+            # заново уйдут и уже доставленные сообщения.
+            logging.debug("Работа прервана, отметка времени не обновлена.")
+            return
         try:
-            with open(str(lsc_path), "w") as success_stamp:
-                last_successful_check = int(time.time())
-                success_stamp.write(str(last_successful_check))
+            _write_ts(poll_started)
+            if fail_idx:
+                BACKOFF_PATH.unlink(missing_ok=True)
         except Exception as error:
             log_message = f"Сбой в работе программы: {str(error)}"
             logging.error(log_message)